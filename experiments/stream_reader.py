@@ -0,0 +1,53 @@
+"""
+Shared reader for Claude CLI subprocesses: NDJSON lines from stdout,
+stderr drained alongside so neither pipe can fill up and stall the child.
+"""
+
+import os
+import selectors
+
+
+def iter_stdout_lines(proc, stderr_buf, chunk_size=65536):
+    """Yield complete stdout lines from proc, appending stderr bytes to stderr_buf.
+
+    Both pipes are multiplexed with a selector (epoll on Linux) and read with
+    os.read on the raw fds. Partial lines are carried over in a bytearray so
+    large bursts stay linear.
+    """
+    sel = selectors.DefaultSelector()
+    sel.register(proc.stdout, selectors.EVENT_READ)
+    sel.register(proc.stderr, selectors.EVENT_READ)
+
+    buf = bytearray()
+    while sel.get_map():
+        for key, _ in sel.select():
+            data = os.read(key.fd, chunk_size)
+            if not data:
+                sel.unregister(key.fileobj)
+                continue
+            if key.fileobj is proc.stderr:
+                stderr_buf.extend(data)
+                continue
+
+            buf.extend(data)
+            start = 0
+            while (nl := buf.find(b"\n", start)) != -1:
+                yield bytes(memoryview(buf)[start:nl])
+                start = nl + 1
+            # Drop consumed lines in one O(tail) delete rather than per line
+            del buf[:start]
+    sel.close()
+
+    if buf:
+        yield bytes(buf)
+
+
+def utf8_prefix(data, limit):
+    """Cut UTF-8 bytes to at most limit without splitting a character."""
+    if len(data) <= limit:
+        return data
+    end = limit
+    # Back up over continuation bytes to the start of the split character
+    while end > 0 and data[end] & 0xC0 == 0x80:
+        end -= 1
+    return data[:end]
@@ -2,12 +2,17 @@
 """
 Test bidirectional JSON stdio - can we inject messages mid-conversation?
 This would allow multi-turn tool use without spawning multiple processes.
+
+Launch with scripts/run-experiment.sh. On a free-threaded build
+(PYTHON=python3.13t PYTHON_GIL=0) the reader thread's parsing overlaps with
+the main thread's writes.
 """
 
 import subprocess
-import json
+import orjson
 import threading
-import time
+
+from stream_reader import iter_stdout_lines
 
 def main():
     print("Testing bidirectional JSON stdio")
@@ -25,17 +30,20 @@ def main():
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         stdin=subprocess.PIPE,
-        text=True,
     )
 
-    # Read stdout in a thread
+    # Reader thread signals this instead of the main thread sleeping blindly
+    turn_done = threading.Event()  # result seen for the current turn
+
+    # Read stdout in a thread; stderr is drained by the same reader
+    stderr_buf = bytearray()
+
     def read_output():
-        for line in proc.stdout:
-            line = line.strip()
-            if not line:
+        for line in iter_stdout_lines(proc, stderr_buf):
+            if not line or line.isspace():
                 continue
             try:
-                msg = json.loads(line)
+                msg = orjson.loads(line)
                 msg_type = msg.get("type", "unknown")
 
                 if msg_type == "assistant":
@@ -45,19 +53,19 @@ def main():
                             print(f"[assistant]: {block.get('text')[:200]}")
                 elif msg_type == "result":
                     print(f"[result] cost=${msg.get('total_cost_usd', 0):.4f}")
+                    turn_done.set()
                 elif msg_type == "system":
                     print(f"[system] ready")
                 else:
                     print(f"[{msg_type}]")
-            except json.JSONDecodeError:
-                print(f"[raw]: {line[:100]}")
+            except orjson.JSONDecodeError:
+                print(f"[raw]: {line[:100].decode('utf-8', 'replace')}")
 
     reader = threading.Thread(target=read_output, daemon=True)
     reader.start()
 
-    # Send first message
-    time.sleep(0.5)  # Wait for init
-
+    # Send first message right away: with stream-json input the CLI only
+    # emits its system init after receiving the first message
     first_msg = {
         "type": "user",
         "message": {
@@ -66,11 +74,13 @@ def main():
         }
     }
     print(f"\n[sending]: user message")
-    proc.stdin.write(json.dumps(first_msg) + "\n")
+    turn_done.clear()
+    proc.stdin.write(orjson.dumps(first_msg) + b"\n")
     proc.stdin.flush()
 
     # Wait for response
-    time.sleep(5)
+    if not turn_done.wait(timeout=30):
+        print("[warn] no result within 30s")
 
     # Send second message
     second_msg = {
@@ -81,17 +91,20 @@ def main():
         }
     }
     print(f"\n[sending]: second user message")
-    proc.stdin.write(json.dumps(second_msg) + "\n")
+    turn_done.clear()
+    proc.stdin.write(orjson.dumps(second_msg) + b"\n")
     proc.stdin.flush()
 
     # Wait for response
-    time.sleep(5)
+    if not turn_done.wait(timeout=30):
+        print("[warn] no result within 30s")
 
     # Close stdin to signal done
     proc.stdin.close()
     proc.wait()
+    reader.join(timeout=5)
 
-    stderr = proc.stderr.read()
+    stderr = stderr_buf.decode('utf-8', 'replace')
     if stderr:
         print(f"\n[stderr]: {stderr[:500]}")
 
@@ -2,12 +2,20 @@
 """
 Minimal experiment: spawn Claude Code CLI and capture JSON output.
 Tests whether CLI subprocess uses Max subscription (no API key needed).
+
+Launch with scripts/run-experiment.sh; set PYTHON to try another interpreter.
 """
 
+import functools
 import subprocess
-import json
+import orjson
 import sys
 
+from stream_reader import iter_stdout_lines, utf8_prefix
+
+# Pretty-printer with options bound once; output goes straight to the byte layer
+DUMP = functools.partial(orjson.dumps, option=orjson.OPT_INDENT_2)
+
 def main():
     prompt = "What is 2 + 2? Reply with just the number."
 
@@ -22,35 +30,37 @@ def main():
         ["claude", "--print", "--output-format", "stream-json", "--verbose", "--", prompt],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
     )
 
     messages = []
+    out = sys.stdout.buffer
 
     # Read NDJSON lines from stdout
-    for line in proc.stdout:
-        line = line.strip()
-        if not line:
+    stderr_buf = bytearray()
+    for line in iter_stdout_lines(proc, stderr_buf):
+        if not line or line.isspace():
             continue
 
         try:
-            msg = json.loads(line)
+            msg = orjson.loads(line)
             messages.append(msg)
 
             # Pretty print each message
             msg_type = msg.get("type", "unknown")
             print(f"\n[{msg_type}]")
-            print(json.dumps(msg, indent=2)[:500])  # Truncate long messages
+            sys.stdout.flush()  # Keep ordering with the text layer
+            out.write(utf8_prefix(DUMP(msg), 500))  # Truncate long messages
+            out.write(b"\n")
 
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse: {line[:100]}")
+        except orjson.JSONDecodeError as e:
+            print(f"Failed to parse: {line[:100].decode('utf-8', 'replace')}")
             print(f"Error: {e}")
 
     # Wait for process to finish
     proc.wait()
 
     # Print stderr if any
-    stderr = proc.stderr.read()
+    stderr = stderr_buf.decode('utf-8', 'replace')
     if stderr:
         print(f"\n[stderr]\n{stderr}")
 
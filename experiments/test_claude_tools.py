@@ -1,10 +1,58 @@
 #!/usr/bin/env python3
 """
 Test Claude CLI with tool calls to see the full message format.
+
+Launch with scripts/run-experiment.sh (PYTHON picks the interpreter).
 """
 
 import subprocess
-import json
+import orjson
+
+from stream_reader import iter_stdout_lines, utf8_prefix
+
+def handle_system(msg):
+    # Only init carries session details; hook and compact-boundary events don't
+    if msg.get("subtype") == "init":
+        print(f"  session_id: {msg['session_id']}")
+        print(f"  model: {msg['model']}")
+
+def handle_assistant(msg):
+    for block in msg["message"]["content"]:
+        block_type = block["type"]
+        if block_type == "text":
+            print(f"  [text]: {block['text'][:200]}")
+        elif block_type == "tool_use":
+            print(f"  [tool_use]: {block['name']} (id: {block['id']})")
+            print(f"    input: {utf8_prefix(orjson.dumps(block['input']), 150).decode()}")
+
+def handle_user(msg):
+    for block in msg["message"]["content"]:
+        if block["type"] == "tool_result":
+            tool_id = block["tool_use_id"]
+            result = block.get("content", "")
+            # Truncate long results (str slicing already returns short strings as-is)
+            if len(result) > 150:
+                result = result[:150] + "..."
+            print(f"  [tool_result] id={tool_id[:20]}...")
+            print(f"    content: {result}")
+
+def handle_result(msg):
+    print(f"  success: {msg['subtype'] == 'success'}")
+    print(f"  cost: ${msg.get('total_cost_usd', 0):.4f}")
+    print(f"  turns: {msg.get('num_turns')}")
+    print(f"  result: {msg.get('result', '')[:200]}")
+
+def handle_unknown(msg):
+    pass
+
+# Dispatch on the stream-json "type" field; handlers subscript the fields the
+# CLI always sends for that type and .get() the optional ones.
+HANDLERS = {
+    "system": handle_system,
+    "assistant": handle_assistant,
+    "user": handle_user,
+    "result": handle_result,
+}
 
 def main():
     # This prompt should trigger tool use (Read tool to check a file)
@@ -17,18 +65,17 @@ def main():
         ["claude", "--print", "--output-format", "stream-json", "--verbose", "--", prompt],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
     )
 
     messages = []
 
-    for line in proc.stdout:
-        line = line.strip()
-        if not line:
+    stderr_buf = bytearray()
+    for line in iter_stdout_lines(proc, stderr_buf):
+        if not line or line.isspace():
             continue
 
         try:
-            msg = json.loads(line)
+            msg = orjson.loads(line)
             messages.append(msg)
 
             msg_type = msg.get("type", "unknown")
@@ -37,45 +84,14 @@ def main():
             print(f"\n--- [{msg_type}] {subtype} ---")
 
             # Show relevant parts based on message type
-            if msg_type == "system":
-                print(f"  session_id: {msg.get('session_id')}")
-                print(f"  model: {msg.get('model')}")
-
-            elif msg_type == "assistant":
-                content = msg.get("message", {}).get("content", [])
-                for block in content:
-                    block_type = block.get("type")
-                    if block_type == "text":
-                        print(f"  [text]: {block.get('text', '')[:200]}")
-                    elif block_type == "tool_use":
-                        print(f"  [tool_use]: {block.get('name')} (id: {block.get('id')})")
-                        print(f"    input: {json.dumps(block.get('input', {}))[:150]}")
-
-            elif msg_type == "user":
-                content = msg.get("message", {}).get("content", [])
-                for block in content:
-                    block_type = block.get("type")
-                    if block_type == "tool_result":
-                        tool_id = block.get("tool_use_id", "")
-                        result = block.get("content", "")
-                        # Truncate long results
-                        if len(result) > 200:
-                            result = result[:200] + "..."
-                        print(f"  [tool_result] id={tool_id[:20]}...")
-                        print(f"    content: {result[:150]}")
-
-            elif msg_type == "result":
-                print(f"  success: {msg.get('subtype') == 'success'}")
-                print(f"  cost: ${msg.get('total_cost_usd', 0):.4f}")
-                print(f"  turns: {msg.get('num_turns')}")
-                print(f"  result: {msg.get('result', '')[:200]}")
-
-        except json.JSONDecodeError as e:
+            HANDLERS.get(msg_type, handle_unknown)(msg)
+
+        except orjson.JSONDecodeError as e:
             print(f"Parse error: {e}")
 
     proc.wait()
 
-    stderr = proc.stderr.read()
+    stderr = stderr_buf.decode('utf-8', 'replace')
     if stderr:
         print(f"\n[stderr]\n{stderr}")
 
@@ -2,10 +2,14 @@
 """
 Test Claude CLI with no tools - pure LLM mode.
 This is closer to how we'd use it for the chatbot.
+
+Launch with scripts/run-experiment.sh; PYTHON overrides the interpreter.
 """
 
 import subprocess
-import json
+import orjson
+
+from stream_reader import iter_stdout_lines
 
 def main():
     # Simulate chatbot system prompt + user message
@@ -40,16 +44,15 @@ When done, output:
         ],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
     )
 
-    for line in proc.stdout:
-        line = line.strip()
-        if not line:
+    stderr_buf = bytearray()
+    for line in iter_stdout_lines(proc, stderr_buf):
+        if not line or line.isspace():
             continue
 
         try:
-            msg = json.loads(line)
+            msg = orjson.loads(line)
             msg_type = msg.get("type", "unknown")
 
             if msg_type == "system":
@@ -64,11 +67,11 @@ When done, output:
             elif msg_type == "result":
                 print(f"\n[result] cost=${msg.get('total_cost_usd', 0):.4f}")
 
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             pass
 
     proc.wait()
-    stderr = proc.stderr.read()
+    stderr = stderr_buf.decode('utf-8', 'replace')
     if stderr:
         print(f"\n[stderr] {stderr}")
 
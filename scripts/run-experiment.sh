@@ -0,0 +1,21 @@
+#!/bin/bash
+# Run a stream-json experiment script with a chosen interpreter.
+# Usage: ./scripts/run-experiment.sh experiments/test_bidirectional.py [args...]
+#
+# Uses python3 unless PYTHON is set. For a free-threaded CPython (3.13t):
+#   PYTHON=python3.13t PYTHON_GIL=0 ./scripts/run-experiment.sh experiments/test_bidirectional.py
+# so the reader thread runs in parallel with the main thread.
+#
+# PyPy is not an option: the scripts parse with orjson, which only supports CPython.
+
+set -e
+
+if [ $# -lt 1 ]; then
+    echo "Usage: $0 <script.py> [args...]"
+    exit 1
+fi
+
+PYTHON="${PYTHON:-python3}"
+
+echo "Using $PYTHON"
+exec "$PYTHON" "$@"
@@ -13,11 +13,17 @@ Voice cloning is supported by placing reference .wav files in the voices directo
 """
 
 import argparse
+import contextlib
 import io
 import os
+import struct
 import sys
+import threading
 from pathlib import Path
 
+import numpy as np
+import soundfile as sf
+
 # Fix for PyTorch 2.6+ strict weights_only default
 import torch
 _original_load = torch.load
@@ -27,8 +33,9 @@ def _patched_load(*args, **kwargs):
     return _original_load(*args, **kwargs)
 torch.load = _patched_load
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file, stream_with_context
 from TTS.api import TTS
+from waitress import serve
 
 app = Flask(__name__)
 
@@ -36,21 +43,117 @@ app = Flask(__name__)
 tts = None
 voices_dir = None
 device = None
+half = False
+
+DEFAULT_SPEAKER = "Ana Florence"  # Built-in XTTS speaker
+
+# Silence appended after each sentence, matching Synthesizer.tts()
+SENTENCE_PAUSE = np.zeros(10000, dtype=np.float32)
+
+# Conditioning latents per reference wav: path -> (mtime, (gpt_cond_latent, speaker_embedding))
+_latent_cache = {}
 
+# One model instance serves all WSGI threads; inference runs one request at a time
+_inference_lock = threading.Lock()
 
-def load_model():
+
+def load_model(fp16=False):
     """Load XTTS model."""
-    global tts, device
+    global tts, device, half
 
     # Use GPU if available
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Loading XTTS v2 on {device}...")
+    half = device == "cuda" and fp16
+    print(f"Loading XTTS v2 on {device}{' (fp16)' if half else ''}...")
 
     # Load XTTS v2 - multilingual model with voice cloning
     tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
+    if half:
+        tts.synthesizer.tts_model.half()
     print("XTTS model loaded successfully")
 
 
+def inference_context():
+    """Autocast to fp16 when the model was loaded in half precision."""
+    if half:
+        return torch.autocast("cuda", dtype=torch.float16)
+    return contextlib.nullcontext()
+
+
+def get_latents(speaker_wav):
+    """Return (gpt_cond_latent, speaker_embedding), computing them once per reference file."""
+    model = tts.synthesizer.tts_model
+    if not speaker_wav:
+        speaker = model.speaker_manager.speakers[DEFAULT_SPEAKER]
+        return speaker["gpt_cond_latent"], speaker["speaker_embedding"]
+
+    # Keyed on mtime too, so replacing a reference file takes effect
+    mtime = os.path.getmtime(speaker_wav)
+    cached = _latent_cache.get(speaker_wav)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    # Same reference settings tts.tts() takes from the model config
+    config = model.config
+    latents = model.get_conditioning_latents(
+        audio_path=[speaker_wav],
+        gpt_cond_len=config.gpt_cond_len,
+        gpt_cond_chunk_len=config.gpt_cond_chunk_len,
+        max_ref_length=config.max_ref_len,
+        sound_norm_refs=config.sound_norm_refs,
+    )
+    _latent_cache[speaker_wav] = (mtime, latents)
+    return latents
+
+
+def synthesize_chunks(text, language, speaker_wav, stream=False):
+    """Yield float32 audio sentence by sentence, with a pause after each.
+
+    With stream=True each sentence is yielded in chunks as the GPT decoder
+    produces them (inference_stream re-vocodes the growing sequence per chunk,
+    so it only pays off for time-to-first-byte); otherwise one inference()
+    call per sentence. Calls the model directly with cached latents;
+    tts.tts() would re-encode the reference on every request.
+    """
+    model = tts.synthesizer.tts_model
+    config = model.config
+    # Same sampling settings tts.tts() takes from the model config
+    settings = {
+        "temperature": config.temperature,
+        "length_penalty": config.length_penalty,
+        "repetition_penalty": config.repetition_penalty,
+        "top_k": config.top_k,
+        "top_p": config.top_p,
+    }
+    with _inference_lock, inference_context():
+        gpt_cond_latent, speaker_embedding = get_latents(speaker_wav)
+        for sentence in tts.synthesizer.split_into_sentences(text):
+            if stream:
+                for chunk in model.inference_stream(
+                    sentence, language, gpt_cond_latent, speaker_embedding, **settings
+                ):
+                    yield chunk.float().cpu().numpy()
+            else:
+                yield model.inference(
+                    sentence, language, gpt_cond_latent, speaker_embedding, **settings
+                )["wav"]
+            yield SENTENCE_PAUSE
+
+
+def wav_stream_header(sample_rate):
+    """Mono PCM16 WAV header with unknown length, for streamed responses."""
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 0xFFFFFFFF, b"WAVE",
+        b"fmt ", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b"data", 0xFFFFFFFF,
+    )
+
+
+def to_pcm16(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
 @app.route("/v1/references/list", methods=["GET"])
 def list_references():
     """List available voice references."""
@@ -83,6 +186,7 @@ def synthesize():
 
     reference_id = data.get("reference_id", "default")
     language = data.get("language", "en")
+    streaming = data.get("streaming", False)
 
     print(f"TTS: \"{text[:50]}...\" (voice={reference_id}, lang={language})")
 
@@ -95,26 +199,33 @@ def synthesize():
                 speaker_wav = str(ref_path)
                 print(f"Using voice reference: {ref_path}")
 
-        # Generate speech
-        wav_buffer = io.BytesIO()
+        sample_rate = tts.synthesizer.output_sample_rate
+
+        if streaming:
+            # Send audio as each chunk is decoded: first byte after the first
+            # chunk of the first sentence instead of after the whole utterance
+            def generate():
+                yield wav_stream_header(sample_rate)
+                try:
+                    for chunk in synthesize_chunks(text, language, speaker_wav, stream=True):
+                        yield to_pcm16(chunk)
+                except Exception as e:
+                    print(f"TTS error: {e}", file=sys.stderr)
+
+            return Response(stream_with_context(generate()), mimetype="audio/wav")
 
-        if speaker_wav:
-            # Voice cloning mode
-            tts.tts_to_file(
-                text=text,
-                file_path=wav_buffer,
-                speaker_wav=speaker_wav,
-                language=language,
-            )
-        else:
-            # Default voice mode (use built-in speaker)
-            tts.tts_to_file(
-                text=text,
-                file_path=wav_buffer,
-                speaker="Ana Florence",  # Default XTTS speaker
-                language=language,
-            )
+        # Generate speech as an in-memory waveform
+        wav = np.concatenate(list(synthesize_chunks(text, language, speaker_wav)))
 
+        # Encode WAV once, straight into the response buffer
+        wav_buffer = io.BytesIO()
+        sf.write(
+            wav_buffer,
+            np.asarray(wav, dtype=np.float32),
+            samplerate=sample_rate,
+            format="WAV",
+            subtype="PCM_16",
+        )
         wav_buffer.seek(0)
         return send_file(
             wav_buffer,
@@ -130,7 +241,7 @@ def synthesize():
 @app.route("/health", methods=["GET"])
 def health():
     """Health check endpoint."""
-    return jsonify({"status": "ok", "model": "xtts_v2", "device": device})
+    return jsonify({"status": "ok", "model": "xtts_v2", "device": device, "fp16": half})
 
 
 def main():
@@ -140,6 +251,8 @@ def main():
     parser.add_argument("--port", type=int, default=8880, help="Port to listen on")
     parser.add_argument("--host", default="127.0.0.1", help="Host to bind to")
     parser.add_argument("--voices-dir", type=Path, default=None, help="Directory with voice reference WAV files")
+    parser.add_argument("--threads", type=int, default=4, help="WSGI worker threads")
+    parser.add_argument("--fp16", action="store_true", help="Run the model in half precision on GPU (experimental)")
     args = parser.parse_args()
 
     voices_dir = args.voices_dir
@@ -150,14 +263,15 @@ def main():
             voices_dir.mkdir(parents=True, exist_ok=True)
 
     # Load model before starting server
-    load_model()
+    load_model(fp16=args.fp16)
 
     print(f"Starting XTTS server on {args.host}:{args.port}")
     if voices_dir:
         print(f"Voice references directory: {voices_dir}")
 
-    # Run Flask server
-    app.run(host=args.host, port=args.port, threaded=True)
+    # Serve with waitress: request parsing and I/O run concurrently on worker
+    # threads while model inference is serialized by _inference_lock
+    serve(app, host=args.host, port=args.port, threads=args.threads)
 
 
 if __name__ == "__main__":